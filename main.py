@@ -2,8 +2,13 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import plotly.io as pio
 import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Serialize figures with orjson instead of the pure-Python json encoder
+pio.json.config.default_engine = 'orjson'
 
 # Set page config
 st.set_page_config(page_title="OGC Analytics Dashboard", layout="wide")
@@ -24,82 +29,349 @@ def check_password():
         st.sidebar.error("Incorrect password")
     return False
 
-# Function to calculate revenue band
+# Revenue bands and the upper limit of annualized revenue for each band but the last
+REVENUE_BANDS = [
+    "Under $50K", "$50K-$100K", "$100K-$250K", "$250K-$500K",
+    "$500K-$1M", "$1M-$2M", "$2M-$5M", "$5M-$10M", "Over $10M"
+]
+REVENUE_BAND_LIMITS = np.array([50000, 100000, 250000, 500000, 1000000, 2000000, 5000000, 10000000])
+
+# Function to calculate revenue bands for a series of six-month revenues
 def get_revenue_band(six_month_revenue):
+    # Annualize the revenue (multiply by 2 since we have 6 months of data); missing counts as zero
+    annual_revenue = six_month_revenue.fillna(0).to_numpy(dtype=np.float64) * 2
+    
+    # Each band includes its upper limit, so search from the left
+    band_index = np.searchsorted(REVENUE_BAND_LIMITS, annual_revenue, side='left')
+    return pd.Series(
+        np.array(REVENUE_BANDS, dtype=object)[band_index],
+        index=six_month_revenue.index
+    )
+
+# Columns of the time entry export used by the dashboard
+SIX_MONTHS_COLUMNS = [
+    'Service Date', 'Invoice Date', 'Associated Attorney', 'PG', 'Hours', 'Amount',
+    'Rate', 'Activity Type', 'Client Name', 'Matter Name', 'Invoice Number', 'SECTOR'
+]
+
+# Text columns used as groupby keys, filters and distinct counts, stored as categoricals
+CATEGORY_COLUMNS = [
+    'Associated Attorney', 'PG', 'Activity Type', 'Client Name', 'Matter Name', 'Invoice Number',
+    'SECTOR'
+]
+
+# Function to read a CSV with the dashboard's date and category typing
+def _read_csv_typed(csv_path, date_cols=(), category_cols=(), **read_kwargs):
+    df = pd.read_csv(csv_path, **read_kwargs)
+    for date_col in date_cols:
+        if date_col in df.columns:
+            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    for col in category_cols:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+# Function to read a CSV through its Parquet copy, rewriting the copy only when the CSV is newer.
+# The copy is written to a temp file and moved into place, so an interrupted write never leaves a
+# truncated file behind; if it cannot be written or read (read-only deploy, full disk) the typed
+# CSV is used directly
+def _read_table(csv_path, columns=None, **kwargs):
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if not os.path.exists(parquet_path) or \
+            os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        df = _read_csv_typed(csv_path, **kwargs)
+        tmp_path = f'{parquet_path}.{os.getpid()}.tmp'
+        try:
+            df.to_parquet(tmp_path, engine='pyarrow', compression='zstd')
+            os.replace(tmp_path, parquet_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return df if columns is None else df[columns]
     try:
-        if pd.isna(six_month_revenue) or six_month_revenue == 0:
-            return "Under $50K"
-            
-        # Annualize the revenue (multiply by 2 since we have 6 months of data)
-        annual_revenue = float(six_month_revenue) * 2
-        
-        if annual_revenue <= 50000:
-            return "Under $50K"
-        elif annual_revenue <= 100000:
-            return "$50K-$100K"
-        elif annual_revenue <= 250000:
-            return "$100K-$250K"
-        elif annual_revenue <= 500000:
-            return "$250K-$500K"
-        elif annual_revenue <= 1000000:
-            return "$500K-$1M"
-        elif annual_revenue <= 2000000:
-            return "$1M-$2M"
-        elif annual_revenue <= 5000000:
-            return "$2M-$5M"
-        elif annual_revenue <= 10000000:
-            return "$5M-$10M"
-        else:
-            return "Over $10M"
-    except Exception as e:
-        print(f"Error processing revenue {six_month_revenue}: {str(e)}")
-        return "Under $50K"
+        return pd.read_parquet(parquet_path, columns=columns, engine='pyarrow')
+    except Exception:
+        df = _read_csv_typed(csv_path, **kwargs)
+        return df if columns is None else df[columns]
 
-# Function to load data
-@st.cache_data
+# Function to load data. The frames are cached as shared objects rather than copied on
+# every rerun, so nothing downstream may modify them in place
+@st.cache_resource(show_spinner='Loading data...')
 def load_data():
     try:
-        # Load main data files
-        six_months = pd.read_csv('SIX_FULL_MOS.csv')
-        attorneys = pd.read_csv('ATTORNEY_PG_AND_HRS.csv')
-        attorney_clients = pd.read_csv('ATTORNEY_CLIENTS.csv', skiprows=1)
-        utilization = pd.read_csv('UTILIZATION.csv', skiprows=2)
-        pivot_source = pd.read_csv('PIVOT_SOURCE_1.csv', skiprows=1)
-        
-        # Convert date columns
-        for date_col in ['Service Date', 'Invoice Date']:
-            if date_col in six_months.columns:
-                six_months[date_col] = pd.to_datetime(six_months[date_col], errors='coerce')
+        # Load the files concurrently; Parquet reads and CSV parsing release the GIL.
+        # Dates and categoricals arrive pre-typed from Parquet
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            six_months = pool.submit(
+                _read_table,
+                'SIX_FULL_MOS.csv',
+                columns=SIX_MONTHS_COLUMNS,
+                date_cols=['Service Date', 'Invoice Date'],
+                category_cols=CATEGORY_COLUMNS,
+                engine='pyarrow'
+            )
+            attorneys = pool.submit(_read_table, 'ATTORNEY_PG_AND_HRS.csv')
+            attorney_clients = pool.submit(_read_table, 'ATTORNEY_CLIENTS.csv', skiprows=1)
+            utilization = pool.submit(_read_table, 'UTILIZATION.csv', skiprows=2)
+            pivot_source = pool.submit(_read_table, 'PIVOT_SOURCE_1.csv', skiprows=1)
+        six_months, attorneys, attorney_clients, utilization, pivot_source = (
+            future.result()
+            for future in (six_months, attorneys, attorney_clients, utilization, pivot_source)
+        )
         
         # Clean up attorney data
         attorneys = attorneys[attorneys['Attorney pipeline stage'] == '🟢 Active']
         
-        # Calculate annualized revenue and revenue bands
-        client_revenue = six_months.groupby('Client Name')['Amount'].sum().reset_index()
-        client_revenue['Revenue Band'] = client_revenue['Amount'].apply(get_revenue_band)
+        # Store key text columns as categoricals so groupbys and filters work on integer codes;
+        # Parquet already keeps them as dictionaries unless the cache predates a column's addition
+        for col in CATEGORY_COLUMNS:
+            six_months[col] = six_months[col].astype('category')
         
-        # Merge revenue bands back to main dataset
-        six_months = six_months.merge(
-            client_revenue[['Client Name', 'Revenue Band']],
-            on='Client Name',
-            how='left'
+        # Calculate annualized revenue and revenue bands per client
+        client_revenue = six_months.groupby('Client Name', observed=True)['Amount'].sum()
+        
+        # Look each row's band up by its client code instead of merging on the client name;
+        # the trailing NaN is picked up by the -1 code of rows without a client
+        clients = six_months['Client Name'].cat
+        band_by_code = np.append(
+            get_revenue_band(client_revenue.reindex(clients.categories)).to_numpy(), np.nan
         )
+        six_months['Revenue Band'] = band_by_code[clients.codes.to_numpy()]
         
-        # Merge attorney target hours
-        six_months = six_months.merge(
-            attorneys[['Attorney Name', '🎚️ Target Hours / Month']],
-            left_on='Associated Attorney',
-            right_on='Attorney Name',
-            how='left'
+        # Billable flag from the activity type categories, compared trimmed and case-insensitively;
+        # the trailing False is picked up by the -1 code of missing values
+        activity_type = six_months['Activity Type'].cat
+        billable_categories = np.append(
+            activity_type.categories.str.strip().str.lower() == 'billable', False
         )
+        six_months['Is Billable'] = billable_categories[activity_type.codes.to_numpy()]
+        
+        # Keep rows in Service Date order so a date range is one contiguous slice
+        six_months = six_months.sort_values('Service Date', kind='stable', ignore_index=True)
         
-        six_months['Target Hours'] = six_months['🎚️ Target Hours / Month']
+        # Integer year*12+month keys used for monthly groupbys
+        for key, date_col in [('_ym', 'Service Date'), ('_invoice_ym', 'Invoice Date')]:
+            six_months[key] = (
+                six_months[date_col].dt.year * 12 + six_months[date_col].dt.month - 1
+            ).astype('Int16')
         
         return six_months, attorneys, attorney_clients, utilization, pivot_source
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None, None, None, None, None
 
+# Function to compute the sidebar filter options once per loaded dataset
+@st.cache_data
+def filter_options():
+    six_months = load_data()[0]
+    return {
+        'min_date': six_months['Service Date'].min(),
+        'max_date': six_months['Service Date'].max(),
+        'attorneys': six_months['Associated Attorney'].cat.categories.tolist(),
+        'practice_groups': six_months['PG'].cat.categories.tolist(),
+        'matters': six_months['Matter Name'].cat.categories.tolist()
+    }
+
+# Function to turn year*12+month keys back into month-end dates for display
+def month_code_to_date(codes):
+    months = np.asarray(codes, dtype=np.int64) - 1970 * 12
+    return pd.to_datetime((months + 1).astype('datetime64[M]') - np.timedelta64(1, 'D'))
+
+# Function to apply the sidebar filters: a slice for the date range, then one combined mask.
+# The result is cached as a shared object rather than copied, so callers must never modify it
+@st.cache_resource(max_entries=32)
+def apply_filters(filter_key, _df):
+    date_range, selected_bands, selected_attorneys, selected_practices, selected_matters = filter_key
+    
+    if date_range:
+        # Rows are sorted by Service Date, so the range is found by binary search and
+        # sliced; the upper bound is exclusive at the next day
+        start, stop = np.searchsorted(
+            _df['Service Date'].to_numpy(),
+            [np.datetime64(date_range[0]), np.datetime64(date_range[1]) + np.timedelta64(1, 'D')]
+        )
+        _df = _df.iloc[start:stop]
+    
+    mask = np.ones(len(_df), dtype=bool)
+    
+    if selected_bands:
+        mask &= _df['Revenue Band'].isin(selected_bands).to_numpy()
+        
+    if selected_attorneys:
+        mask &= _df['Associated Attorney'].isin(selected_attorneys).to_numpy()
+    
+    if selected_practices:
+        mask &= _df['PG'].isin(selected_practices).to_numpy()
+    
+    if selected_matters:
+        mask &= _df['Matter Name'].isin(selected_matters).to_numpy()
+    
+    return _df if mask.all() else _df.loc[mask]
+
+# Aggregations of the filtered data, cached per filter selection and bounded like apply_filters.
+# The filter key identifies the filtered frame, so the frame itself (_df) is not hashed.
+@st.cache_data(max_entries=32)
+def monthly_agg(filter_key, _df):
+    monthly = _df.groupby('_ym', sort=True).agg({
+        'Hours': 'sum',
+        'Amount': 'sum',
+        'Invoice Number': 'nunique'
+    })
+    # Keep months without activity as zero rows, as a monthly resample would
+    if not monthly.empty:
+        monthly = monthly.reindex(
+            np.arange(monthly.index.min(), monthly.index.max() + 1), fill_value=0
+        )
+    monthly = monthly.rename_axis('_ym').reset_index()
+    monthly.insert(0, 'Service Date', month_code_to_date(monthly.pop('_ym')))
+    return monthly
+
+@st.cache_data(max_entries=32)
+def last_month_bills(filter_key, _df):
+    # Only the latest invoice month is shown, so count just that month's invoices
+    invoice_months = _df['_invoice_ym']
+    last_month = invoice_months.max()
+    if pd.isna(last_month):
+        return 0
+    in_last_month = invoice_months.eq(last_month).fillna(False).to_numpy(dtype=bool)
+    return _df.loc[in_last_month, 'Invoice Number'].nunique()
+
+@st.cache_data(max_entries=32)
+def monthly_band_agg(filter_key, _df):
+    monthly = _df.groupby(['_ym', 'Revenue Band'], observed=True, sort=True).agg({
+        'Hours': 'sum',
+        'Amount': 'sum',
+        'Invoice Number': 'nunique',
+        'Matter Name': 'nunique',
+        'Client Name': 'nunique'
+    }).reset_index()
+    monthly.insert(0, 'Service Date', month_code_to_date(monthly.pop('_ym')))
+    return monthly
+
+@st.cache_data(max_entries=32)
+def attorney_agg(filter_key, _df, _target_hours):
+    # Per-attorney totals in one linear pass over the category codes instead of a hash groupby
+    attorney = _df['Associated Attorney'].cat
+    codes = attorney.codes.to_numpy()
+    has_attorney = codes >= 0
+    codes = codes[has_attorney]
+    n_attorneys = len(attorney.categories)
+    
+    hours = np.bincount(
+        codes,
+        weights=np.nan_to_num(_df['Hours'].to_numpy()[has_attorney]),
+        minlength=n_attorneys
+    )
+    # Target hours are constant per attorney, so they are looked up once per category
+    target_hours = _target_hours.reindex(attorney.categories).to_numpy()
+    
+    observed = np.bincount(codes, minlength=n_attorneys) > 0
+    return pd.DataFrame({
+        'Associated Attorney': pd.Categorical.from_codes(
+            np.flatnonzero(observed), dtype=_df['Associated Attorney'].dtype
+        ),
+        'Hours': hours[observed],
+        'Target Hours': target_hours[observed]
+    })
+
+@st.cache_data(max_entries=32)
+def client_agg(filter_key, _df):
+    return _df.groupby('Client Name', observed=True).agg({
+        'Hours': 'sum',
+        'Amount': 'sum',
+        'Matter Name': 'nunique',
+        'Invoice Number': 'nunique',
+        'Revenue Band': 'first'
+    }).reset_index()
+
+@st.cache_data(max_entries=32)
+def band_agg(filter_key, _df):
+    return _df.groupby('Revenue Band', observed=True).agg({
+        'Client Name': 'nunique',
+        'Amount': 'sum',
+        'Hours': 'sum',
+        'Matter Name': 'nunique',
+        'Associated Attorney': 'nunique'
+    }).reset_index()
+
+@st.cache_data(max_entries=32)
+def attorney_band_agg(filter_key, _df, _target_hours):
+    attorney_metrics = _df.groupby(['Associated Attorney', 'Revenue Band'], observed=True).agg({
+        'Hours': 'sum',
+        'Amount': 'sum',
+        'Client Name': 'nunique',
+        'Matter Name': 'nunique'
+    }).reset_index()
+    attorney_metrics['Target Hours'] = \
+        _target_hours.reindex(attorney_metrics['Associated Attorney']).to_numpy()
+    return attorney_metrics
+
+@st.cache_data(max_entries=32)
+def pg_agg(filter_key, _df):
+    return _df.groupby(['PG', 'Revenue Band'], observed=True).agg({
+        'Hours': 'sum',
+        'Amount': 'sum',
+        'Matter Name': 'nunique',
+        'Client Name': 'nunique',
+        'Associated Attorney': 'nunique'
+    }).reset_index()
+
+@st.cache_data(max_entries=32)
+def client_ltv_agg(filter_key, _df):
+    client_metrics = _df.groupby('Client Name', observed=True).agg(**{
+        'Total Revenue': ('Amount', 'sum'),
+        'Avg Revenue': ('Amount', 'mean'),
+        'Total Hours': ('Hours', 'sum'),
+        'Avg Hours': ('Hours', 'mean'),
+        'Matter Count': ('Matter Name', 'nunique'),
+        'Invoice Count': ('Invoice Number', 'nunique'),
+        'Sector': ('SECTOR', 'first'),
+        'First Service': ('Service Date', 'min'),
+        'Last Service': ('Service Date', 'max'),
+        'Revenue Band': ('Revenue Band', 'first')
+    }).reset_index()
+    
+    # Calculate retention period
+    client_metrics['Retention Days'] = (
+        client_metrics['Last Service'] - client_metrics['First Service']
+    ).dt.days
+    
+    # Calculate Daily Revenue
+    client_metrics['Daily Revenue'] = client_metrics['Total Revenue'] / \
+        client_metrics['Retention Days'].clip(lower=1)
+    client_metrics['Projected Annual Value'] = client_metrics['Daily Revenue'] * 365
+    
+    # Most recent date is the latest per-client last service, no second pass over the rows
+    recent_date = client_metrics['Last Service'].max()
+    
+    # Calculate LTV metrics
+    client_metrics['Monthly Revenue'] = client_metrics['Total Revenue'] / \
+        (client_metrics['Retention Days'] / 30).clip(lower=1)
+    client_metrics['Avg Monthly Revenue'] = client_metrics['Monthly Revenue']\
+        .rolling(window=3, min_periods=1).mean()
+    
+    # More than 90 whole days since the last service, as one datetime comparison; with no
+    # clients recent_date is NaT, so the cutoff is NaT and nothing compares as churned
+    churn_cutoff = recent_date - pd.Timedelta(days=91)
+    client_metrics['Churn Probability'] = np.where(
+        client_metrics['Last Service'] <= churn_cutoff,
+        0.8,  # High churn probability for inactive clients
+        0.2   # Lower churn probability for active clients
+    )
+    
+    client_metrics['LTV'] = (client_metrics['Avg Monthly Revenue'] / \
+        client_metrics['Churn Probability']) * 12
+    
+    return client_metrics
+
+# Function to build a pie chart once per distinct set of slices. Labels and values are passed
+# as small tuples so they are hashed into the cache key, and reruns reuse the figure
+@st.cache_resource(max_entries=64)
+def cached_pie(title, labels, values):
+    fig = go.Figure(go.Pie(labels=np.asarray(labels), values=np.asarray(values)))
+    fig.update_layout(title=title)
+    return fig
+
 # Main app logic
 if check_password():
     # Remove the password input field after authentication
@@ -110,13 +382,18 @@ if check_password():
     six_months_df, attorneys_df, attorney_clients_df, utilization_df, pivot_source_df = load_data()
 
     if six_months_df is not None:
+        # Monthly target hours per active attorney, looked up on the aggregated results
+        target_hours = attorneys_df.drop_duplicates('Attorney Name')\
+            .set_index('Attorney Name')['🎚️ Target Hours / Month']
+        
         # Sidebar filters
         st.sidebar.header('Filters')
+        options = filter_options()
 
         # Date filter
         try:
-            min_date = six_months_df['Service Date'].min()
-            max_date = six_months_df['Service Date'].max()
+            min_date = options['min_date']
+            max_date = options['max_date']
             date_range = st.sidebar.date_input(
                 "Date Range",
                 value=(min_date.date(), max_date.date()),
@@ -128,63 +405,47 @@ if check_password():
             date_range = None
 
         # Revenue Band filter
-        revenue_bands = [
-            "Under $50K", "$50K-$100K", "$100K-$250K", "$250K-$500K",
-            "$500K-$1M", "$1M-$2M", "$2M-$5M", "$5M-$10M", "Over $10M"
-        ]
+        revenue_bands = REVENUE_BANDS
         selected_bands = st.sidebar.multiselect('Revenue Bands', revenue_bands)
 
         # Attorney filter
-        attorneys = sorted(six_months_df['Associated Attorney'].dropna().unique())
-        selected_attorneys = st.sidebar.multiselect('Attorneys', attorneys)
+        selected_attorneys = st.sidebar.multiselect('Attorneys', options['attorneys'])
 
         # Practice Group filter
-        practice_groups = sorted(six_months_df['PG'].dropna().unique())
-        selected_practices = st.sidebar.multiselect('Practice Groups', practice_groups)
+        selected_practices = st.sidebar.multiselect('Practice Groups', options['practice_groups'])
 
         # Matter filter
-        matters = sorted(six_months_df['Matter Name'].dropna().unique())
-        selected_matters = st.sidebar.multiselect('Matters', matters)
+        selected_matters = st.sidebar.multiselect('Matters', options['matters'])
 
-        # Apply filters
-        filtered_df = six_months_df.copy()
-        
-        if date_range and len(date_range) == 2:
-            filtered_df = filtered_df[
-                (filtered_df['Service Date'].dt.date >= date_range[0]) &
-                (filtered_df['Service Date'].dt.date <= date_range[1])
-            ]
-        
-        if selected_bands:
-            filtered_df = filtered_df[filtered_df['Revenue Band'].isin(selected_bands)]
-            
-        if selected_attorneys:
-            filtered_df = filtered_df[filtered_df['Associated Attorney'].isin(selected_attorneys)]
-        
-        if selected_practices:
-            filtered_df = filtered_df[filtered_df['PG'].isin(selected_practices)]
-        
-        if selected_matters:
-            filtered_df = filtered_df[filtered_df['Matter Name'].isin(selected_matters)]
+        # Cache key for the filtered data and its aggregations
+        filter_key = (
+            tuple(date_range) if date_range and len(date_range) == 2 else None,
+            tuple(selected_bands),
+            tuple(selected_attorneys),
+            tuple(selected_practices),
+            tuple(selected_matters)
+        )
+        filtered_df = apply_filters(filter_key, six_months_df)
 
-        # Tabs
-        tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+        # Views; st.tabs runs every tab body on each rerun, so only the selected view is rendered
+        views = [
             "Overview", "Client Analysis", "Revenue Bands", "Client Segmentation", 
             "Attorney Analysis", "Practice Areas", "Trending"
-        ])
+        ]
+        view = st.radio("View", views, horizontal=True, label_visibility="collapsed", key="view")
 
-        with tab1:
+        if view == "Overview":
             st.header("Overview")
             
             # Key Performance Indicators
             col1, col2, col3, col4 = st.columns(4)
             
             # Monthly bills generated
-            monthly_bills = filtered_df.groupby(pd.Grouper(key='Invoice Date', freq='M'))['Invoice Number'].nunique()
+            monthly_bills = last_month_bills(filter_key, filtered_df)
             with col1:
                 st.metric(
                     "Monthly Bills Generated", 
-                    f"{monthly_bills.iloc[-1] if not monthly_bills.empty else 0:,.0f}",
+                    f"{monthly_bills:,.0f}",
                     help="Number of unique bills generated in the last month"
                 )
             
@@ -192,10 +453,14 @@ if check_password():
             # Add debug prints to check activity types
             st.write("Unique Activity Types:", filtered_df['Activity Type'].unique())
             
-            # Clean up activity type values and make case-insensitive comparison
-            filtered_df['Activity Type'] = filtered_df['Activity Type'].str.strip().str.lower()
-            total_billable = filtered_df[filtered_df['Activity Type'] == 'billable']['Hours'].sum()
-            total_hours = filtered_df['Hours'].sum()
+            # Split hours into non-billable/billable totals in a single pass
+            hours_by_type = np.bincount(
+                filtered_df['Is Billable'].to_numpy(dtype=np.intp),
+                weights=np.nan_to_num(filtered_df['Hours'].to_numpy()),
+                minlength=2
+            )
+            total_billable = hours_by_type[1]
+            total_hours = hours_by_type.sum()
             
             with col2:
                 st.metric(
@@ -225,24 +490,22 @@ if check_password():
             
             # Monthly trends
             st.subheader("Monthly Performance Trends")
-            monthly_metrics = filtered_df.groupby(pd.Grouper(key='Service Date', freq='M')).agg({
-                'Hours': 'sum',
-                'Amount': 'sum',
-                'Invoice Number': 'nunique'
-            }).reset_index()
+            monthly_metrics = monthly_agg(filter_key, filtered_df)
+            
+            months = monthly_metrics['Service Date'].to_numpy()
             
             fig = go.Figure()
             
             fig.add_trace(go.Bar(
-                x=monthly_metrics['Service Date'],
-                y=monthly_metrics['Hours'],
+                x=months,
+                y=monthly_metrics['Hours'].to_numpy(),
                 name='Hours',
                 yaxis='y'
             ))
             
             fig.add_trace(go.Scatter(
-                x=monthly_metrics['Service Date'],
-                y=monthly_metrics['Amount'],
+                x=months,
+                y=monthly_metrics['Amount'].to_numpy(),
                 name='Revenue',
                 yaxis='y2',
                 line=dict(color='red')
@@ -252,44 +515,44 @@ if check_password():
                 title='Monthly Hours and Revenue',
                 yaxis=dict(title='Hours', side='left'),
                 yaxis2=dict(title='Revenue', side='right', overlaying='y'),
-                showlegend=True
+                showlegend=True,
+                uirevision='monthly-trends'
             )
             
             st.plotly_chart(fig, use_container_width=True)
 
             # Utilization metrics
             st.subheader("Utilization Overview")
-            attorney_util = filtered_df.groupby('Associated Attorney').agg({
-                'Hours': 'sum',
-                'Target Hours': 'first'
-            }).reset_index()
-            
-            attorney_util['Utilization Rate'] = attorney_util.apply(
-                lambda x: (x['Hours'] / x['Target Hours'] * 100) if pd.notnull(x['Target Hours']) and x['Target Hours'] > 0 else 0,
-                axis=1
+            attorney_util = attorney_agg(filter_key, filtered_df, target_hours)
+            
+            # Attorneys without a positive target get 0 (NaN > 0 is False)
+            targets = attorney_util['Target Hours'].to_numpy(dtype=float)
+            has_target = targets > 0
+            attorney_util['Utilization Rate'] = np.where(
+                has_target,
+                attorney_util['Hours'].to_numpy() / np.where(has_target, targets, 1) * 100,
+                0
             )
             
-            fig = px.bar(
-                attorney_util.sort_values('Utilization Rate', ascending=False),
-                x='Associated Attorney',
-                y='Utilization Rate',
-                title='Attorney Utilization Rates (%)'
+            attorney_util = attorney_util.sort_values('Utilization Rate', ascending=False)
+            fig = go.Figure(go.Bar(
+                x=attorney_util['Associated Attorney'].to_numpy(),
+                y=attorney_util['Utilization Rate'].to_numpy()
+            ))
+            fig.update_layout(
+                title='Attorney Utilization Rates (%)',
+                xaxis_title='Associated Attorney',
+                yaxis_title='Utilization Rate'
             )
             
             fig.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Target")
             st.plotly_chart(fig, use_container_width=True)
 
-        with tab2:
+        if view == "Client Analysis":
             st.header("Client Analysis")
             
             # Client metrics
-            clients_df = filtered_df.groupby('Client Name').agg({
-                'Hours': 'sum',
-                'Amount': 'sum',
-                'Matter Name': 'nunique',
-                'Invoice Number': 'nunique',
-                'Revenue Band': 'first'
-            }).reset_index()
+            clients_df = client_agg(filter_key, filtered_df)
             
             # Calculate averages
             avg_revenue_per_client = clients_df['Amount'].mean()
@@ -353,17 +616,11 @@ if check_password():
                 use_container_width=True
             )
 
-        with tab3:
+        if view == "Revenue Bands":
             st.header("Revenue Band Analysis")
             
             # Calculate revenue band metrics
-            band_metrics = filtered_df.groupby('Revenue Band').agg({
-                'Client Name': 'nunique',
-                'Amount': 'sum',
-                'Hours': 'sum',
-                'Matter Name': 'nunique',
-                'Associated Attorney': 'nunique'
-            }).reset_index()
+            band_metrics = band_agg(filter_key, filtered_df)
             
             # Calculate percentages
             total_clients = band_metrics['Client Name'].sum()
@@ -376,20 +633,18 @@ if check_password():
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = px.pie(
-                    band_metrics,
-                    values='Client Name',
-                    names='Revenue Band',
-                    title='Client Distribution by Revenue Band'
+                fig = cached_pie(
+                    'Client Distribution by Revenue Band',
+                    tuple(band_metrics['Revenue Band'].tolist()),
+                    tuple(band_metrics['Client Name'].tolist())
                 )
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                fig = px.pie(
-                    band_metrics,
-                    values='Amount',
-                    names='Revenue Band',
-                    title='Revenue Distribution by Band'
+                fig = cached_pie(
+                    'Revenue Distribution by Band',
+                    tuple(band_metrics['Revenue Band'].tolist()),
+                    tuple(band_metrics['Amount'].tolist())
                 )
                 st.plotly_chart(fig, use_container_width=True)
             
@@ -405,74 +660,70 @@ if check_password():
             
             # Top clients in each band
             st.subheader("Top Clients by Revenue Band")
+            # One per-client aggregate (each client sits in a single band), ranked once and
+            # cut to the top five per band, instead of re-filtering the rows for every band
+            top_by_band = client_agg(filter_key, filtered_df)\
+                .sort_values('Amount', ascending=False, kind='stable')\
+                .groupby('Revenue Band', observed=True, sort=False)\
+                .head(5)
             for band in revenue_bands:
-                band_clients = filtered_df[filtered_df['Revenue Band'] == band]
-                if not band_clients.empty:
+                top_clients = top_by_band.loc[
+                    top_by_band['Revenue Band'] == band, ['Client Name', 'Amount']
+                ].reset_index(drop=True)
+                if not top_clients.empty:
                     st.write(f"**{band}**")
-                    top_clients = band_clients.groupby('Client Name')['Amount'].sum()\
-                        .sort_values(ascending=False)\
-                        .head(5)\
-                        .reset_index()
                     top_clients['Amount'] = top_clients['Amount'].apply(lambda x: f"${x:,.2f}")
                     st.dataframe(top_clients, use_container_width=True)
 
-        with tab4:
+        if view == "Client Segmentation":
             st.header("Client Segmentation")
             
             try:
-                # Calculate comprehensive client metrics
-                client_metrics = filtered_df.groupby('Client Name').agg({
-                    'Amount': ['sum', 'mean'],
-                    'Hours': ['sum', 'mean'],
-                    'Matter Name': 'nunique',
-                    'Invoice Number': 'nunique',
-                    'SECTOR': lambda x: x.iloc[0] if not x.empty else None,
-                    'Service Date': ['min', 'max'],
-                    'Revenue Band': 'first'
-                }).reset_index()
-
-                # Flatten column names
-                client_metrics.columns = ['Client Name', 'Total Revenue', 'Avg Revenue', 
-                                        'Total Hours', 'Avg Hours', 'Matter Count',
-                                        'Invoice Count', 'Sector', 'First Service', 'Last Service',
-                                        'Revenue Band']
-                
-                # Calculate retention period
-                client_metrics['Retention Days'] = (
-                    client_metrics['Last Service'] - client_metrics['First Service']
-                ).dt.days
-                
-                # Calculate Daily Revenue
-                client_metrics['Daily Revenue'] = client_metrics['Total Revenue'] / \
-                    client_metrics['Retention Days'].clip(lower=1)
-                client_metrics['Projected Annual Value'] = client_metrics['Daily Revenue'] * 365
+                # Calculate comprehensive client metrics, including lifetime value
+                client_metrics = client_ltv_agg(filter_key, filtered_df)
+                
+                # Calculate value band metrics once; the distribution charts read from them too
+                band_stats = client_metrics.groupby('Revenue Band', observed=True).agg({
+                    'Client Name': 'count',
+                    'Total Revenue': ['sum', 'mean'],
+                    'Monthly Revenue': 'mean',
+                    'LTV': ['mean', 'median', 'max'],
+                    'Retention Days': ['mean', 'median'],
+                    'Matter Count': 'mean'
+                })
+                
+                band_stats.columns = [
+                    'Client Count', 'Total Revenue', 'Avg Revenue', 'Avg Monthly Revenue',
+                    'Avg LTV', 'Median LTV', 'Max LTV', 'Avg Retention', 'Median Retention',
+                    'Avg Matters'
+                ]
                 
                 # Revenue band distribution
                 st.subheader("Revenue Distribution")
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    revenue_dist = client_metrics['Revenue Band'].value_counts()
-                    fig = px.pie(
-                        values=revenue_dist.values,
-                        names=revenue_dist.index,
-                        title="Clients by Revenue Band"
+                    revenue_dist = band_stats['Client Count'].sort_values(ascending=False, kind='stable')
+                    fig = cached_pie(
+                        "Clients by Revenue Band",
+                        tuple(revenue_dist.index.tolist()),
+                        tuple(revenue_dist.tolist())
                     )
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
-                    revenue_total = client_metrics.groupby('Revenue Band')['Total Revenue'].sum()
-                    fig = px.pie(
-                        values=revenue_total.values,
-                        names=revenue_total.index,
-                        title="Revenue by Band"
+                    revenue_total = band_stats['Total Revenue']
+                    fig = cached_pie(
+                        "Revenue by Band",
+                        tuple(revenue_total.index.tolist()),
+                        tuple(revenue_total.tolist())
                     )
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Industry Analysis
                 st.subheader("Industry Analysis")
                 if 'Sector' in client_metrics.columns:
-                    sector_metrics = client_metrics.groupby(['Sector', 'Revenue Band']).agg({
+                    sector_metrics = client_metrics.groupby(['Sector', 'Revenue Band'], observed=True).agg({
                         'Client Name': 'count',
                         'Total Revenue': 'sum',
                         'Total Hours': 'sum'
@@ -491,39 +742,7 @@ if check_password():
                 # Client Value Analysis
                 st.subheader("Client Value Analysis")
                 
-                # Get most recent date from the data
-                recent_date = filtered_df['Service Date'].max()
-                
-                # Calculate LTV metrics
-                client_metrics['Monthly Revenue'] = client_metrics['Total Revenue'] / \
-                    (client_metrics['Retention Days'] / 30).clip(lower=1)
-                client_metrics['Avg Monthly Revenue'] = client_metrics['Monthly Revenue']\
-                    .rolling(window=3, min_periods=1).mean()
-                
-                client_metrics['Churn Probability'] = np.where(
-                    (recent_date - client_metrics['Last Service']).dt.days > 90,
-                    0.8,  # High churn probability for inactive clients
-                    0.2   # Lower churn probability for active clients
-                )
-                
-                client_metrics['LTV'] = (client_metrics['Avg Monthly Revenue'] / \
-                    client_metrics['Churn Probability']) * 12
-                
-                # Calculate value band metrics
-                value_metrics = client_metrics.groupby('Revenue Band').agg({
-                    'Client Name': 'count',
-                    'Total Revenue': ['sum', 'mean'],
-                    'Monthly Revenue': 'mean',
-                    'LTV': ['mean', 'median', 'max'],
-                    'Retention Days': ['mean', 'median'],
-                    'Matter Count': 'mean'
-                }).round(2)
-                
-                value_metrics.columns = [
-                    'Client Count', 'Total Revenue', 'Avg Revenue', 'Avg Monthly Revenue',
-                    'Avg LTV', 'Median LTV', 'Max LTV', 'Avg Retention', 'Median Retention',
-                    'Avg Matters'
-                ]
+                value_metrics = band_stats.round(2)
                 
                 # Add revenue concentration
                 total_revenue = value_metrics['Total Revenue'].sum()
@@ -550,20 +769,23 @@ if check_password():
                 
                 with col1:
                     # LTV by Revenue Band
-                    fig = px.bar(
-                        x=value_metrics.index,
-                        y=value_metrics['Avg LTV'],
+                    fig = go.Figure(go.Bar(
+                        x=value_metrics.index.to_numpy(),
+                        y=value_metrics['Avg LTV'].to_numpy()
+                    ))
+                    fig.update_layout(
                         title="Average Lifetime Value by Revenue Band",
-                        labels={'x': 'Revenue Band', 'y': 'Average LTV ($)'}
+                        xaxis_title='Revenue Band',
+                        yaxis_title='Average LTV ($)'
                     )
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
                     # Revenue Concentration
-                    fig = px.pie(
-                        values=value_metrics['Revenue Concentration (%)'],
-                        names=value_metrics.index,
-                        title="Revenue Concentration by Band"
+                    fig = cached_pie(
+                        "Revenue Concentration by Band",
+                        tuple(value_metrics.index.tolist()),
+                        tuple(value_metrics['Revenue Concentration (%)'].tolist())
                     )
                     st.plotly_chart(fig, use_container_width=True)
                 
@@ -596,18 +818,12 @@ if check_password():
             except Exception as e:
                 st.error(f"Error in client segmentation analysis: {str(e)}")
 
-        with tab5:
+        if view == "Attorney Analysis":
             st.header("Attorney Analysis")
             
             try:
                 # Attorney productivity metrics
-                attorney_metrics = filtered_df.groupby(['Associated Attorney', 'Revenue Band']).agg({
-                    'Hours': 'sum',
-                    'Amount': 'sum',
-                    'Client Name': 'nunique',
-                    'Matter Name': 'nunique',
-                    'Target Hours': 'first'
-                }).reset_index()
+                attorney_metrics = attorney_band_agg(filter_key, filtered_df, target_hours)
                 
                 # Calculate utilization rate
                 attorney_metrics['Utilization Rate'] = (attorney_metrics['Hours'] / 
@@ -706,19 +922,13 @@ if check_password():
             except Exception as e:
                 st.error(f"Error in attorney analysis: {str(e)}")
 
-        with tab6:
+        if view == "Practice Areas":
             st.header("Practice Areas")
             
             try:
                 if 'PG' in filtered_df.columns:
                     # Practice area metrics
-                    practice_metrics = filtered_df.groupby(['PG', 'Revenue Band']).agg({
-                        'Hours': 'sum',
-                        'Amount': 'sum',
-                        'Matter Name': 'nunique',
-                        'Client Name': 'nunique',
-                        'Associated Attorney': 'nunique'
-                    }).reset_index()
+                    practice_metrics = pg_agg(filter_key, filtered_df)
                     
                     # Calculate derived metrics
                     practice_metrics['Avg Rate'] = practice_metrics['Amount'] / practice_metrics['Hours']
@@ -732,21 +942,19 @@ if check_password():
                     
                     with col1:
                         # Practice area distribution by hours
-                        fig = px.pie(
-                            practice_metrics,
-                            values='Hours',
-                            names='PG',
-                            title='Hours by Practice Area'
+                        fig = cached_pie(
+                            'Hours by Practice Area',
+                            tuple(practice_metrics['PG'].tolist()),
+                            tuple(practice_metrics['Hours'].tolist())
                         )
                         st.plotly_chart(fig, use_container_width=True)
                     
                     with col2:
                         # Practice area distribution by revenue
-                        fig = px.pie(
-                            practice_metrics,
-                            values='Amount',
-                            names='PG',
-                            title='Revenue by Practice Area'
+                        fig = cached_pie(
+                            'Revenue by Practice Area',
+                            tuple(practice_metrics['PG'].tolist()),
+                            tuple(practice_metrics['Amount'].tolist())
                         )
                         st.plotly_chart(fig, use_container_width=True)
                     
@@ -795,21 +1003,12 @@ if check_password():
             except Exception as e:
                 st.error(f"Error in practice area analysis: {str(e)}")
 
-        with tab7:
+        if view == "Trending":
             st.header("Trending")
             
             try:
                 # Time series analysis
-                monthly_trends = filtered_df.groupby([
-                    pd.Grouper(key='Service Date', freq='M'),
-                    'Revenue Band'
-                ]).agg({
-                    'Hours': 'sum',
-                    'Amount': 'sum',
-                    'Invoice Number': 'nunique',
-                    'Matter Name': 'nunique',
-                    'Client Name': 'nunique'
-                }).reset_index()
+                monthly_trends = monthly_band_agg(filter_key, filtered_df)
                 
                 # Calculate derived metrics
                 monthly_trends['Avg Rate'] = monthly_trends['Amount'] / monthly_trends['Hours']
@@ -820,13 +1019,14 @@ if check_password():
                 # Hours and revenue trend
                 fig = go.Figure()
                 
-                # Add bars for hours by revenue band
+                # Add bars for hours by revenue band, splitting the monthly rows into bands once
+                band_groups = dict(tuple(monthly_trends.groupby('Revenue Band', observed=True, sort=False)))
                 for band in revenue_bands:
-                    band_data = monthly_trends[monthly_trends['Revenue Band'] == band]
-                    if not band_data.empty:
+                    band_data = band_groups.get(band)
+                    if band_data is not None:
                         fig.add_trace(go.Bar(
-                            x=band_data['Service Date'],
-                            y=band_data['Hours'],
+                            x=band_data['Service Date'].to_numpy(),
+                            y=band_data['Hours'].to_numpy(),
                             name=f'Hours ({band})',
                             yaxis='y'
                         ))
@@ -834,8 +1034,8 @@ if check_password():
                 # Add line for total revenue
                 revenue_by_month = monthly_trends.groupby('Service Date')['Amount'].sum().reset_index()
                 fig.add_trace(go.Scatter(
-                    x=revenue_by_month['Service Date'],
-                    y=revenue_by_month['Amount'],
+                    x=revenue_by_month['Service Date'].to_numpy(),
+                    y=revenue_by_month['Amount'].to_numpy(),
                     name='Total Revenue',
                     yaxis='y2',
                     line=dict(color='red')